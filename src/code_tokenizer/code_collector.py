@@ -4,28 +4,256 @@ Code Collection and Analysis Tool
 Supports project code scanning, cache management, statistical analysis and other functions
 """
 
+import os
+import re
 import json
 import hashlib
+import mmap
+import shutil
+import time
 import fnmatch
+import functools
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
 from datetime import datetime
-from typing import List, Dict
+from typing import List, Dict, Callable, Iterable, Iterator, Optional, Tuple
 from rich.console import Console
 from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TaskProgressColumn
 from rich.panel import Panel
 
 from .core import FileAnalyzer
-from .constants import DEFAULT_EXCLUDE_PATTERNS, DEFAULT_FILE_PATTERNS
+from .constants import (DEFAULT_EXCLUDE_PATTERNS, DEFAULT_FILE_PATTERNS, DEFAULT_SKIP_DIRS,
+                        CACHE_VALIDATION_MODES)
 from .utils import format_tokens, format_bytes
 from .table_width_manager import TableWidthManager
 
+try:
+    from blake3 import blake3 as _new_file_hasher
+except ImportError:
+    # blake3 is optional, BLAKE2b with the same 32 byte digest is the fallback
+    _new_file_hasher = functools.partial(hashlib.blake2b, digest_size=32)
+
+try:
+    import orjson
+except ImportError:
+    # orjson is optional, the cache index is plain JSON either way
+    orjson = None
+
+_EMPTY_FILE_HASH = _new_file_hasher().hexdigest()
+# Files from this size on are hashed through mmap
+_MMAP_MIN_SIZE = 1 << 20
+
 console = Console()
 
+# File reads are I/O bound, at most _READ_AHEAD files are held ahead of the writer
+_READ_WORKERS = min(32, (os.cpu_count() or 1) * 4)
+_READ_AHEAD = 64
+# Output is written in large blocks, one write per file block
+_WRITE_BUFFER_SIZE = 1 << 20
+# Modification times this recent are not trusted, a later change may share them
+_RACY_WINDOW_NS = 2 * 10**9
+
+# Glob matching follows the platform's case sensitivity, like fnmatch and pathlib
+_PATTERN_FLAGS = re.IGNORECASE if os.path.normcase('A') == 'a' else 0
+
+
+def _trusted_mtime_ns(stat: os.stat_result) -> Optional[int]:
+    """Get the modification time of a stat result, None if it is too recent to trust"""
+    return stat.st_mtime_ns if stat.st_mtime_ns < time.time_ns() - _RACY_WINDOW_NS else None
+
+
+def _read_file(file_path: Path) -> Tuple[os.stat_result, bytes]:
+    """Read file metadata and raw content"""
+    with open(file_path, 'rb') as f:
+        return os.fstat(f.fileno()), f.read()
+
+
+def _read_files_ahead(files: Iterable[Path]) -> Iterator[Tuple[Path, Future]]:
+    """Read files in a thread pool, yields (file_path, future) in order with a bounded read-ahead"""
+    with ThreadPoolExecutor(max_workers=_READ_WORKERS) as executor:
+        pending = deque()
+        for file_path in files:
+            pending.append((file_path, executor.submit(_read_file, file_path)))
+            # Bound the number of file contents held in memory
+            if len(pending) >= _READ_AHEAD:
+                yield pending.popleft()
+        while pending:
+            yield pending.popleft()
+
+
+def _decode_content(data: bytes) -> Tuple[Optional[str], Optional[str]]:
+    """Decode file content as UTF-8 or GBK, returns (None, None) for binary content"""
+    for encoding in ('utf-8', 'gbk'):
+        try:
+            content = data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+        # Translate newlines like reading the file in text mode does
+        if '\r' in content:
+            content = content.replace('\r\n', '\n').replace('\r', '\n')
+        return content, encoding
+    return None, None
+
+
+def _encode_content(data: bytes) -> Tuple[Optional[bytes], Optional[str]]:
+    """Convert file content to UTF-8 with LF newlines, returns (None, None) for binary content"""
+    # UTF-8 without carriage returns is written as is, ASCII is not decoded at all
+    if b'\r' not in data:
+        if data.isascii():
+            return data, 'utf-8'
+        try:
+            data.decode('utf-8')
+            return data, 'utf-8'
+        except UnicodeDecodeError:
+            pass
+    content, encoding = _decode_content(data)
+    if content is None:
+        return None, None
+    return content.encode('utf-8'), encoding
+
+
+# Compiled patterns are cached by pattern tuple, repeated scans reuse them
+@functools.lru_cache(maxsize=128)
+def _compile_regex(patterns: Tuple[str, ...]) -> Optional[re.Pattern]:
+    """Combine glob patterns into a single regex, None if there are no patterns"""
+    if not patterns:
+        return None
+    return re.compile('|'.join(fnmatch.translate(pattern) for pattern in patterns), _PATTERN_FLAGS)
+
+
+# Compiled patterns: (name regex, path segment regexes, '**' segment regexes)
+_Matcher = Tuple[Optional[re.Pattern], Tuple[Tuple[re.Pattern, ...], ...],
+                 Tuple[Tuple[Optional[re.Pattern], ...], ...]]
+
+
+@functools.lru_cache(maxsize=128)
+def _compile_patterns(patterns: Tuple[str, ...]) -> Optional[_Matcher]:
+    """Compile rglob-style patterns into a matcher for _match_patterns"""
+    if not patterns:
+        return None
+    name_patterns = []
+    path_patterns = []
+    recursive_patterns = []
+    for pattern in patterns:
+        segments = pattern.strip('/').split('/')
+        if '**' in segments:
+            # rglob(pattern) globs "**/" + pattern
+            recursive_patterns.append((None,) + tuple(
+                None if segment == '**' else re.compile(fnmatch.translate(segment), _PATTERN_FLAGS)
+                for segment in segments))
+        elif len(segments) == 1:
+            name_patterns.append(segments[0])
+        else:
+            path_patterns.append(tuple(re.compile(fnmatch.translate(segment), _PATTERN_FLAGS)
+                                       for segment in segments))
+    return _compile_regex(tuple(name_patterns)), tuple(path_patterns), tuple(recursive_patterns)
+
+
+def _match_segments(segments: Tuple[Optional[re.Pattern], ...], parts: Tuple[str, ...],
+                    i: int = 0, j: int = 0) -> bool:
+    """Check if parts[j:] matches segments[i:], a None ('**') segment matches any directories"""
+    while i < len(segments):
+        segment = segments[i]
+        if segment is None:
+            # '**' only matches directories, never the file name
+            if i == len(segments) - 1:
+                return False
+            return any(_match_segments(segments, parts, i + 1, k) for k in range(j, len(parts)))
+        if j >= len(parts) or not segment.match(parts[j]):
+            return False
+        i += 1
+        j += 1
+    return j == len(parts)
+
+
+def _match_patterns(matcher: _Matcher, parts: Tuple[str, ...]) -> bool:
+    """Check if a relative path matches any pattern, like Path.rglob(pattern) would"""
+    name_regex, path_patterns, recursive_patterns = matcher
+    if name_regex is not None and name_regex.match(parts[-1]):
+        return True
+    # Path patterns match the trailing segments of the relative path
+    for segments in path_patterns:
+        if len(segments) <= len(parts) and all(
+                segment.match(part) for segment, part in zip(segments, parts[-len(segments):])):
+            return True
+    return any(_match_segments(segments, parts) for segments in recursive_patterns)
+
+
+# Hashable copy of the default file patterns for the compiled pattern cache
+_DEFAULT_FILE_PATTERNS = tuple(DEFAULT_FILE_PATTERNS)
+
+
+def _list_dir(dir_path: str, parts: Tuple[str, ...]) -> List[os.DirEntry]:
+    """List a directory sorted by name, so a depth-first walk yields sorted(Path) order"""
+    with os.scandir(dir_path) as entries:
+        return sorted(entries, key=lambda entry: os.path.normcase(entry.name))
+
+
+class _SnapshotEntry:
+    """Directory entry replayed from a warm scan snapshot in place of an os.DirEntry"""
+
+    __slots__ = ('name', '_is_dir')
+
+    def __init__(self, name: str, is_dir: bool):
+        self.name = name
+        self._is_dir = is_dir
+
+    def is_dir(self, follow_symlinks: bool = True) -> bool:
+        return self._is_dir
+
+
+class _WarmScan:
+    """Directory listing for walks, unchanged directories are replayed from an earlier walk"""
+
+    def __init__(self, directories: Dict[str, Optional[List[int]]] = None,
+                 files: Iterable[str] = ()):
+        # [inode, mtime_ns, ctime_ns] of listed directories, None if untrusted
+        self.directories = {}
+        self._snapshot_directories = directories or {}
+        self._children = {}
+        for relative_path in self._snapshot_directories:
+            if relative_path:
+                parent, name = os.path.split(relative_path)
+                self._children.setdefault(parent, []).append(_SnapshotEntry(name, True))
+        for relative_path in files:
+            parent, name = os.path.split(relative_path)
+            self._children.setdefault(parent, []).append(_SnapshotEntry(name, False))
+        for children in self._children.values():
+            children.sort(key=lambda entry: os.path.normcase(entry.name))
+
+    def list_dir(self, dir_path: str, parts: Tuple[str, ...]) -> List:
+        """List a directory like _list_dir, from the snapshot if it is unchanged"""
+        relative_dir = os.path.join(*parts) if parts else ""
+        try:
+            stat = os.stat(dir_path)
+        except OSError:
+            stat = None
+        # The change time also covers permission changes
+        fingerprint = None
+        if stat is not None and _trusted_mtime_ns(stat) is not None:
+            fingerprint = [stat.st_ino, stat.st_mtime_ns, stat.st_ctime_ns]
+        if fingerprint is not None and self._snapshot_directories.get(relative_dir) == fingerprint:
+            self.directories[relative_dir] = fingerprint
+            return self._children.get(relative_dir, [])
+
+        # Directories that cannot be listed stay untrusted
+        self.directories[relative_dir] = None
+        entries = _list_dir(dir_path, parts)
+        # Symlink targets can change without touching the directory
+        if not any(entry.is_symlink() for entry in entries):
+            self.directories[relative_dir] = fingerprint
+        return entries
+
+
 class CodeCollector:
     """Code Collector"""
 
-    def __init__(self, cache_dir: str = ".code_cache"):
+    def __init__(self, cache_dir: str = ".code_cache", skip_dirs: Iterable[str] = None):
         self.cache_dir = Path(cache_dir)
+        # Directory names pruned before descending, hidden directories too by default
+        self.skip_hidden_dirs = skip_dirs is None
+        self.skip_dirs = frozenset(DEFAULT_SKIP_DIRS if skip_dirs is None else skip_dirs)
         self.cache_dir.mkdir(exist_ok=True)
         self.cache_index_file = self.cache_dir / "cache_index.json"
         self.cache_index = self._load_cache_index()
@@ -35,23 +263,38 @@ class CodeCollector:
         """Load cache index"""
         if self.cache_index_file.exists():
             try:
-                with open(self.cache_index_file, 'r', encoding='utf-8') as f:
-                    return json.load(f)
-            except (json.JSONDecodeError, FileNotFoundError):
+                data = self.cache_index_file.read_bytes()
+                return orjson.loads(data) if orjson is not None else json.loads(data)
+            except (ValueError, FileNotFoundError):
                 return {}
         return {}
 
     def _save_cache_index(self):
         """Save cache index"""
+        if orjson is not None:
+            self.cache_index_file.write_bytes(
+                orjson.dumps(self.cache_index, option=orjson.OPT_INDENT_2))
+            return
         with open(self.cache_index_file, 'w', encoding='utf-8') as f:
             json.dump(self.cache_index, f, ensure_ascii=False, indent=2)
 
-    def _get_file_hash(self, file_path: Path) -> str:
-        """Calculate file hash value"""
+    def _get_file_hash(self, file_path: Path, length: int = 64) -> str:
+        """Calculate file hash value, truncated to length hex characters"""
         try:
             with open(file_path, 'rb') as f:
-                return hashlib.md5(f.read()).hexdigest()
-        except (IOError, OSError):
+                size = os.fstat(f.fileno()).st_size
+                # Empty files cannot be memory mapped
+                if size == 0:
+                    return _EMPTY_FILE_HASH[:length]
+                hasher = _new_file_hasher()
+                if size < _MMAP_MIN_SIZE:
+                    hasher.update(f.read())
+                else:
+                    # Hash large files from the mapped pages
+                    with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                        hasher.update(mm)
+                return hasher.hexdigest()[:length]
+        except (IOError, OSError, ValueError):
             return ""
 
     def _get_project_hash(self, project_path: Path, file_patterns: List[str],
@@ -60,6 +303,93 @@ class CodeCollector:
         hash_source = f"{project_path}_{sorted(file_patterns)}_{sorted(exclude_patterns)}"
         return hashlib.md5(hash_source.encode()).hexdigest()[:16]
 
+    def _hash_files(self, files: List[Path]) -> List[str]:
+        """Hash files in a thread pool, hashes are returned in the order of files"""
+        if len(files) <= 1:
+            return [self._get_file_hash(file_path) for file_path in files]
+        # Hashing and file reads release the GIL, so threads run them in parallel
+        with ThreadPoolExecutor(max_workers=min(_READ_WORKERS, len(files))) as executor:
+            return list(executor.map(self._get_file_hash, files))
+
+    def _is_cache_valid(self, cache_entry: Dict, files: List[Path], project_path: Path,
+                        cache_validation: str = "mtime+hash") -> bool:
+        """Check whether a cache entry still matches the current project files"""
+        cached_files = cache_entry.get("files")
+        # Entries written by older versions carry no file metadata
+        if cached_files is None or len(cached_files) != len(files):
+            return False
+
+        # Compare metadata first, files that need a content check are hashed together
+        to_hash = []
+        for file_path in files:
+            cached = cached_files.get(str(file_path.relative_to(project_path)))
+            if cached is None:
+                return False
+
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                return False
+
+            # "mtime+hash" hashes files with changed or untrusted metadata
+            metadata = (stat.st_size, stat.st_mtime_ns)
+            metadata_matches = metadata == (cached["size"], cached["mtime_ns"])
+            if metadata_matches and cache_validation != "hash":
+                continue
+            if cache_validation == "mtime":
+                return False
+            to_hash.append((file_path, stat, cached))
+
+        hashes = self._hash_files([file_path for file_path, _, _ in to_hash])
+        refreshed = False
+        for (file_path, stat, cached), content_hash in zip(to_hash, hashes):
+            if content_hash != cached["content_hash"]:
+                return False
+
+            # Content is unchanged, remember the new metadata to skip hashing next time
+            mtime_ns = _trusted_mtime_ns(stat)
+            if (cached["size"], cached["mtime_ns"]) != (stat.st_size, mtime_ns):
+                cached["size"] = stat.st_size
+                cached["mtime_ns"] = mtime_ns
+                refreshed = True
+
+        if refreshed:
+            self._save_cache_index()
+        return True
+
+    def _get_gitignore_fingerprint(self, project_path: Path) -> Optional[List[int]]:
+        """Get [size, mtime_ns] of the project's .gitignore, None if there is none"""
+        try:
+            stat = os.stat(project_path / '.gitignore')
+        except OSError:
+            return None
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def _make_snapshot(self, directories: Dict[str, Optional[List[int]]],
+                       gitignore_fingerprint: Optional[List[int]]) -> Optional[Dict]:
+        """Build the directory snapshot of a cache entry, None if the .gitignore is too recent"""
+        if (gitignore_fingerprint is not None
+                and gitignore_fingerprint[1] >= time.time_ns() - _RACY_WINDOW_NS):
+            return None
+        return {
+            "skip_dirs": sorted(self.skip_dirs),
+            "skip_hidden_dirs": self.skip_hidden_dirs,
+            "gitignore": gitignore_fingerprint,
+            "directories": directories
+        }
+
+    def _get_warm_scan(self, cache_entry: Optional[Dict],
+                       gitignore_fingerprint: Optional[List[int]]) -> _WarmScan:
+        """Get the warm scan of a cache entry, it lists everything if the snapshot does not apply"""
+        snapshot = cache_entry.get("snapshot") if cache_entry is not None else None
+        # Scan settings outside the cache key and the .gitignore rules must be unchanged
+        if (snapshot is None or cache_entry.get("files") is None
+                or snapshot["skip_dirs"] != sorted(self.skip_dirs)
+                or snapshot.get("skip_hidden_dirs") != self.skip_hidden_dirs
+                or snapshot["gitignore"] != gitignore_fingerprint):
+            return _WarmScan()
+        return _WarmScan(snapshot["directories"], cache_entry["files"].keys())
+
     def _load_gitignore_rules(self, project_path: Path) -> List[str]:
         """Load and parse .gitignore rules from project root"""
         gitignore_path = project_path / '.gitignore'
@@ -155,8 +485,23 @@ class CodeCollector:
                   exclude_patterns: List[str] = None, include_patterns: List[str] = None,
                   use_gitignore: bool = True) -> List[Path]:
         """Scan project files"""
+        return list(self._iter_files(project_path, file_patterns, exclude_patterns,
+                                     include_patterns, use_gitignore))
+
+    def _iter_files(self, project_path: str, file_patterns: List[str] = None,
+                    exclude_patterns: List[str] = None, include_patterns: List[str] = None,
+                    use_gitignore: bool = True) -> Iterator[Path]:
+        """Walk project files once, yields the files of scan_files in sorted order"""
+        return self._walk_files(project_path, file_patterns, exclude_patterns, include_patterns,
+                                use_gitignore, _list_dir)
+
+    def _walk_files(self, project_path: str, file_patterns: Optional[List[str]],
+                    exclude_patterns: Optional[List[str]], include_patterns: Optional[List[str]],
+                    use_gitignore: bool,
+                    list_dir: Callable[[str, Tuple[str, ...]], List]) -> Iterator[Path]:
+        """Walk project files like _iter_files, directories are listed by list_dir"""
         if file_patterns is None:
-            file_patterns = DEFAULT_FILE_PATTERNS
+            file_patterns = _DEFAULT_FILE_PATTERNS
 
         if exclude_patterns is None:
             exclude_patterns = DEFAULT_EXCLUDE_PATTERNS
@@ -165,181 +510,206 @@ class CodeCollector:
             include_patterns = []
 
         project_path = Path(project_path)
-        files = []
-        processed_files = set()
 
         # Load .gitignore rules if enabled
         gitignore_rules = []
         if use_gitignore:
             gitignore_rules = self._load_gitignore_rules(project_path)
 
-        # First process files in include_patterns (highest priority)
-        if include_patterns:
-            for include_pattern in include_patterns:
-                for file_path in project_path.rglob(include_pattern):
-                    # Exclude directories
-                    if file_path.is_dir():
-                        continue
+        # Compile all patterns once instead of calling fnmatch per file and pattern
+        include_matcher = _compile_patterns(tuple(include_patterns))
+        file_matcher = _compile_patterns(tuple(file_patterns))
+        # Included files are only excluded by exact matches of the path or the file name
+        include_exclude_regex = _compile_regex(tuple(exclude_patterns))
+        # Other files are also excluded when a pattern matches any part of the path
+        exclude_regex = _compile_regex(tuple(f"*{pattern}*" for pattern in exclude_patterns))
+
+        def is_excluded(path_str: str) -> bool:
+            normalized = os.path.normcase(path_str)
+            return (exclude_regex is not None and exclude_regex.match(normalized) is not None
+                    or any(pattern in path_str for pattern in exclude_patterns))
+
+        def walk_into(dir_path: str, parts: Tuple[str, ...], include_only: bool):
+            """Stack item of a directory"""
+            try:
+                entries = list_dir(dir_path, parts)
+            except OSError:
+                entries = []
+            return dir_path, parts, include_only, iter(entries)
+
+        # Single iterative depth-first walk, each stack item is
+        # (directory, relative parts, include only, remaining entries)
+        root = str(project_path)
+        stack = [walk_into(root, (), is_excluded(root))]
+        while stack:
+            dir_path, dir_parts, include_only, entries = stack[-1]
+            entry = next(entries, None)
+            if entry is None:
+                stack.pop()
+                continue
+
+            path_str = entry.name if dir_path == '.' else os.path.join(dir_path, entry.name)
+            parts = dir_parts + (entry.name,)
+
+            if entry.is_dir(follow_symlinks=False):
+                # Skipped and excluded directories are only entered for include patterns
+                if (include_only or entry.name in self.skip_dirs
+                        or self.skip_hidden_dirs and entry.name.startswith('.')
+                        or is_excluded(path_str)):
+                    if include_matcher is not None:
+                        stack.append(walk_into(path_str, parts, True))
+                else:
+                    stack.append(walk_into(path_str, parts, False))
+                continue
+
+            # Like rglob, everything but directories is a file candidate
+            if entry.is_dir():
+                continue
+
+            # Files in include_patterns have the highest priority
+            if include_matcher is not None and _match_patterns(include_matcher, parts):
+                # Included files are only excluded by exact matches
+                should_exclude = (include_exclude_regex is not None and (
+                    include_exclude_regex.match(os.path.normcase(path_str)) is not None or
+                    include_exclude_regex.match(os.path.normcase(entry.name)) is not None))
+            elif (not include_only and file_matcher is not None
+                  and _match_patterns(file_matcher, parts)):
+                # Check for hidden files (filename starts with dot) and exclusion patterns
+                should_exclude = entry.name.startswith('.') or is_excluded(path_str)
+            else:
+                continue
 
-                    # Avoid duplicate processing
-                    if file_path in processed_files:
-                        continue
+            file_path = Path(path_str)
 
-                    processed_files.add(file_path)
-
-                    # For included files, only check exact matches to avoid hidden files being incorrectly excluded
-                    should_exclude = False
-                    for exclude_pattern in exclude_patterns:
-                        # For included files, use stricter matching method
-                        if (fnmatch.fnmatch(str(file_path), exclude_pattern) or
-                            fnmatch.fnmatch(file_path.name, exclude_pattern)):
-                            should_exclude = True
-                            break
-
-                    # Check .gitignore rules for included files (lower priority than explicit includes)
-                    if not should_exclude and use_gitignore:
-                        should_exclude = self._should_exclude_by_gitignore(file_path, project_path, gitignore_rules)
-
-                    if not should_exclude:
-                        files.append(file_path)
-
-        # Then process default file patterns
-        for pattern in file_patterns:
-            for file_path in project_path.rglob(pattern):
-                # Exclude directories
-                if file_path.is_dir():
-                    continue
-
-                # Avoid duplicate processing
-                if file_path in processed_files:
-                    continue
-
-                processed_files.add(file_path)
-
-                # Check for hidden files (filename starts with dot)
-                if file_path.name.startswith('.'):
-                    continue
-
-                # Check exclusion patterns (using wildcard matching and substring matching)
-                should_exclude = False
-                for exclude_pattern in exclude_patterns:
-                    # Try multiple matching methods
-                    if (fnmatch.fnmatch(str(file_path), exclude_pattern) or
-                        fnmatch.fnmatch(file_path.name, exclude_pattern) or
-                        fnmatch.fnmatch(str(file_path), f"*{exclude_pattern}*") or
-                        exclude_pattern in str(file_path) or
-                        exclude_pattern in file_path.name):
-                        should_exclude = True
-                        break
-
-                # Check .gitignore rules if enabled and not already excluded
-                if not should_exclude and use_gitignore:
-                    should_exclude = self._should_exclude_by_gitignore(file_path, project_path, gitignore_rules)
-
-                if not should_exclude:
-                    files.append(file_path)
-
-        # Remove duplicates and sort
-        files = sorted(list(set(files)))
-        return files
+            # Check .gitignore rules if enabled and not already excluded
+            if not should_exclude and use_gitignore:
+                should_exclude = self._should_exclude_by_gitignore(file_path, project_path,
+                                                                   gitignore_rules)
+
+            if not should_exclude:
+                yield file_path
 
     def get_default_file_patterns(self) -> List[str]:
         """Get default file pattern list"""
         return DEFAULT_FILE_PATTERNS
 
+    def _write_file_blocks(self, f, files: Iterable[Path], project_path: Path,
+                           on_file: Callable[[Path], None] = None,
+                           files_metadata: Dict[str, Dict] = None):
+        """Write the content block of each file to a binary file, optionally with cache metadata"""
+        separator = ("\n" + "-"*80 + "\n\n").encode()
+        for i, (file_path, read_future) in enumerate(_read_files_ahead(files), 1):
+            if on_file is not None:
+                on_file(file_path)
+
+            # Collect the block of each file and write it at once
+            chunks = []
+            try:
+                relative_path = file_path.relative_to(project_path)
+
+                chunks.append(f"--- [{i:03d}] - [{relative_path}] ---\n".encode())
+                stat, data = read_future.result()
+                if files_metadata is not None:
+                    files_metadata[str(relative_path)] = {
+                        "size": stat.st_size,
+                        "mtime_ns": _trusted_mtime_ns(stat),
+                        "content_hash": _new_file_hasher(data).hexdigest()
+                    }
+                chunks.append((
+                    f"File Size: {stat.st_size} bytes\n"
+                    "Modified Time: "
+                    f"{datetime.fromtimestamp(stat.st_mtime).strftime('%Y-%m-%d %H:%M:%S')}\n"
+                    "\n"
+                ).encode())
+
+                # Decode file content, UTF-8 first then GBK
+                content, encoding = _encode_content(data)
+                if content is None:
+                    chunks.append(
+                        b"\n\n[Note: File contains binary content, cannot be displayed]\n\n")
+                else:
+                    chunks.append(content)
+                    if encoding == 'gbk':
+                        chunks.append(b"\n\n[Note: Read using GBK encoding]\n\n")
+
+                chunks.append(separator)
+
+            except Exception as e:
+                chunks.append(f"\n\n[Error: Unable to read file - {str(e)}]\n\n".encode())
+                chunks.append(separator[1:])
+
+            f.writelines(chunks)
+
     def _write_files_to_file(self, files: List[Path], output_file: str, project_path: Path):
         """Write file contents to file (internal method)"""
-        with open(output_file, 'w', encoding='utf-8') as f:
+        with open(output_file, 'wb', buffering=_WRITE_BUFFER_SIZE) as f:
             # Write header information
-            f.write("# Code Collection Report\n")
-            f.write(f"# Project Path: {project_path}\n")
-            f.write(f"# Collection Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write(f"# File Count: {len(files)}\n")
-            f.write("#" + "="*80 + "\n\n")
+            f.write((
+                "# Code Collection Report\n"
+                f"# Project Path: {project_path}\n"
+                f"# Collection Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+                f"# File Count: {len(files)}\n"
+                "#" + "="*80 + "\n\n"
+            ).encode())
 
-            for i, file_path in enumerate(files, 1):
-                try:
-                    relative_path = file_path.relative_to(project_path)
-
-                    f.write(f"--- [{i:03d}] - [{relative_path}] ---\n")
-                    f.write(f"File Size: {file_path.stat().st_size} bytes\n")
-                    f.write(f"Modified Time: {datetime.fromtimestamp(file_path.stat().st_mtime).strftime('%Y-%m-%d %H:%M:%S')}\n")
-                    f.write("\n")
-
-                    # Read file content
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as src:
-                            content = src.read()
-                            f.write(content)
-                    except UnicodeDecodeError:
-                        # Try other encodings
-                        try:
-                            with open(file_path, 'r', encoding='gbk') as src:
-                                content = src.read()
-                                f.write(content)
-                                f.write("\n\n[Note: Read using GBK encoding]\n\n")
-                        except UnicodeDecodeError:
-                            f.write("\n\n[Note: File contains binary content, cannot be displayed]\n\n")
-
-                    f.write("\n" + "-"*80 + "\n\n")
-
-                except Exception as e:
-                    f.write(f"\n\n[Error: Unable to read file - {str(e)}]\n\n")
-                    f.write("-"*80 + "\n\n")
+            self._write_file_blocks(f, files, project_path)
 
     def _write_files_to_custom_format(self, files: List[Path], output_file: str, project_path: Path):
         """Write file contents to file (custom format)"""
-        with open(output_file, 'w', encoding='utf-8') as f:
+        with open(output_file, 'wb', buffering=_WRITE_BUFFER_SIZE) as f:
             # Write header information
-            f.write("# Code Collection Report\n")
-            f.write(f"# Project Path: {project_path}\n")
-            f.write(f"# Collection Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write(f"# File Count: {len(files)}\n")
-            f.write("#" + "="*80 + "\n\n")
-
-            for i, file_path in enumerate(files, 1):
+            f.write((
+                "# Code Collection Report\n"
+                f"# Project Path: {project_path}\n"
+                f"# Collection Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+                f"# File Count: {len(files)}\n"
+                "#" + "="*80 + "\n\n"
+            ).encode())
+
+            for i, (file_path, read_future) in enumerate(_read_files_ahead(files), 1):
                 try:
                     relative_path = file_path.relative_to(project_path)
 
                     # Calculate file line count
-                    try:
-                        with open(file_path, 'r', encoding='utf-8') as src:
-                            content = src.read()
-                            # Count newline characters to match wc -l
-                            line_count = content.count('\n')
-                    except UnicodeDecodeError:
-                        try:
-                            with open(file_path, 'r', encoding='gbk') as src:
-                                content = src.read()
-                                # Count newline characters to match wc -l
-                                line_count = content.count('\n')
-                        except UnicodeDecodeError:
-                            content = ""
-                            line_count = 0
+                    _, data = read_future.result()
+                    content, _ = _encode_content(data)
+                    if content is None:
+                        content = b""
+                    # Count newline characters to match wc -l
+                    line_count = content.count(b'\n')
 
                     # Use required format
-                    f.write(f"####### [idx:{i}] - [path:{relative_path}] - [rows:{line_count}] #######\n")
+                    chunks = [(f"####### [idx:{i}] - [path:{relative_path}] - "
+                               f"[rows:{line_count}] #######\n").encode()]
 
                     # Write file content
                     if content:
-                        f.write(content)
+                        chunks.append(content)
                         # Ensure file content ends with newline
-                        if not content.endswith('\n'):
-                            f.write('\n')
+                        if not content.endswith(b'\n'):
+                            chunks.append(b'\n')
                     else:
-                        f.write("[File content is empty or cannot be read]\n")
+                        chunks.append(b"[File content is empty or cannot be read]\n")
 
-                    f.write("\n\n")
+                    chunks.append(b"\n\n")
+                    f.writelines(chunks)
 
                 except Exception as e:
-                    f.write(f"####### [{i}] - [{file_path.relative_to(project_path)}] - [ERROR] #######\n")
-                    f.write(f"[Error: Unable to read file - {str(e)}]\n\n")
+                    f.write((
+                        f"####### [{i}] - [{file_path.relative_to(project_path)}] - "
+                        "[ERROR] #######\n"
+                        f"[Error: Unable to read file - {str(e)}]\n\n"
+                    ).encode())
 
     def collect_code(self, project_path: str, output_file: str = None,
                     file_patterns: List[str] = None,
                     exclude_patterns: List[str] = None,
-                    use_cache: bool = True) -> str:
+                    use_cache: bool = True,
+                    cache_validation: str = "mtime+hash") -> str:
         """Collect code to file"""
+        if cache_validation not in CACHE_VALIDATION_MODES:
+            raise ValueError(f"Invalid cache validation mode: {cache_validation}")
+
         project_path = Path(project_path).resolve()
 
         if output_file is None:
@@ -350,25 +720,41 @@ class CodeCollector:
                                             exclude_patterns or [])
         cache_key = f"{project_path.name}_{project_hash}"
 
-        # Check cache
-        if use_cache and cache_key in self.cache_index:
-            cache_file = self.cache_dir / self.cache_index[cache_key]["file"]
-            if cache_file.exists():
-                console.print(f"[green]✓[/green] Using cache file: {cache_file}")
-                # Copy cache file to target location
-                with open(cache_file, 'r', encoding='utf-8') as src, \
-                     open(output_file, 'w', encoding='utf-8') as dst:
-                    dst.write(src.read())
-                return output_file
-
         # Scan files
         console.print("[blue]🔍[/blue] Scanning project files...")
-        files = self.scan_files(project_path, file_patterns, exclude_patterns)
+        cache_entry = self.cache_index.get(cache_key) if use_cache else None
+        gitignore_fingerprint = self._get_gitignore_fingerprint(project_path)
+        if use_cache:
+            # Directories unchanged since the cached walk are not listed again
+            warm_scan = self._get_warm_scan(cache_entry, gitignore_fingerprint)
+            files = list(self._walk_files(project_path, file_patterns, exclude_patterns, None,
+                                          True, warm_scan.list_dir))
+        else:
+            files = list(self._iter_files(project_path, file_patterns, exclude_patterns))
 
         if not files:
             console.print("[red]❌[/red] No files found")
             return output_file
 
+        # Check cache
+        if cache_entry is not None:
+            cache_file = self.cache_dir / cache_entry["file"]
+            if cache_file.exists() and self._is_cache_valid(cache_entry, files, project_path,
+                                                            cache_validation):
+                console.print(f"[green]✓[/green] Using cache file: {cache_file}")
+                # Remember directories listed again, so the next warm scan can skip them
+                snapshot = self._make_snapshot(warm_scan.directories, gitignore_fingerprint)
+                if cache_entry.get("snapshot") != snapshot:
+                    cache_entry["snapshot"] = snapshot
+                    self._save_cache_index()
+                # Copy cache file to target location
+                shutil.copyfile(cache_file, output_file)
+                return output_file
+
+        # Cache metadata is taken from the file reads below
+        files_metadata = {} if use_cache else None
+        file_count = len(files)
+
         # Collect code
         with Progress(
             SpinnerColumn(),
@@ -378,75 +764,59 @@ class CodeCollector:
             console=console
         ) as progress:
 
-            task = progress.add_task("[cyan]Collecting code files...", total=len(files))
+            task = progress.add_task("[cyan]Collecting code files...", total=file_count)
 
-            with open(output_file, 'w', encoding='utf-8') as f:
+            def on_file(file_path: Path):
+                progress.update(task, advance=1, description=f"[cyan]Processing: {file_path.name}")
+
+            with open(output_file, 'wb', buffering=_WRITE_BUFFER_SIZE) as f:
                 # Write header information
-                f.write("# Code Collection Report\n")
-                f.write(f"# Project Path: {project_path}\n")
-                f.write(f"# Collection Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-                f.write(f"# File Count: {len(files)}\n")
-                f.write(f"# File Patterns: {', '.join(file_patterns or ['Default'])}\n")
-                f.write(f"# Exclude Patterns: {', '.join(exclude_patterns or ['Default'])}\n")
-                f.write("#" + "="*80 + "\n\n")
-
-                for i, file_path in enumerate(files, 1):
-                    progress.update(task, advance=1, description=f"[cyan]Processing: {file_path.name}")
-
-                    try:
-                        relative_path = file_path.relative_to(project_path)
-
-                        f.write(f"--- [{i:03d}] - [{relative_path}] ---\n")
-                        f.write(f"File Size: {file_path.stat().st_size} bytes\n")
-                        f.write(f"Modified Time: {datetime.fromtimestamp(file_path.stat().st_mtime).strftime('%Y-%m-%d %H:%M:%S')}\n")
-                        f.write("\n")
-
-                        # Read file content
-                        try:
-                            with open(file_path, 'r', encoding='utf-8') as src:
-                                content = src.read()
-                                f.write(content)
-                        except UnicodeDecodeError:
-                            # Try other encodings
-                            try:
-                                with open(file_path, 'r', encoding='gbk') as src:
-                                    content = src.read()
-                                    f.write(content)
-                                    f.write("\n\n[Note: Read using GBK encoding]\n\n")
-                            except UnicodeDecodeError:
-                                f.write("\n\n[Note: File contains binary content, cannot be displayed]\n\n")
-
-                        f.write("\n" + "-"*80 + "\n\n")
-
-                    except Exception as e:
-                        f.write(f"\n\n[Error: Unable to read file - {str(e)}]\n\n")
-                        f.write("-"*80 + "\n\n")
+                f.write((
+                    "# Code Collection Report\n"
+                    f"# Project Path: {project_path}\n"
+                    f"# Collection Time: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+                    f"# File Count: {file_count}\n"
+                    f"# File Patterns: {', '.join(file_patterns or ['Default'])}\n"
+                    f"# Exclude Patterns: {', '.join(exclude_patterns or ['Default'])}\n"
+                    "#" + "="*80 + "\n\n"
+                ).encode())
+
+                self._write_file_blocks(f, files, project_path, on_file=on_file,
+                                        files_metadata=files_metadata)
 
         # Save to cache
         if use_cache:
+            # Files that could not be read are missing from the cached file list,
+            # so their directories are listed again by the next warm scan
+            if len(files_metadata) < file_count:
+                for file_path in files:
+                    relative_path = str(file_path.relative_to(project_path))
+                    if relative_path not in files_metadata:
+                        warm_scan.directories[os.path.dirname(relative_path)] = None
+
             cache_file_name = f"cache_{project_hash}.txt"
             cache_file = self.cache_dir / cache_file_name
 
             # Copy to cache directory
-            with open(output_file, 'r', encoding='utf-8') as src, \
-                 open(cache_file, 'w', encoding='utf-8') as dst:
-                dst.write(src.read())
+            shutil.copyfile(output_file, cache_file)
 
             # Update cache index
             self.cache_index[cache_key] = {
                 "file": cache_file_name,
                 "project_path": str(project_path),
                 "created_at": datetime.now().isoformat(),
-                "file_count": len(files),
+                "file_count": file_count,
                 "file_patterns": file_patterns,
-                "exclude_patterns": exclude_patterns
+                "exclude_patterns": exclude_patterns,
+                "files": files_metadata,
+                "snapshot": self._make_snapshot(warm_scan.directories, gitignore_fingerprint)
             }
             self._save_cache_index()
 
             console.print(f"[green]✓[/green] Saved to cache: {cache_file}")
 
         console.print(f"[green]✓[/green] Code collection completed: {output_file}")
-        console.print(f"[blue]📊[/blue] Processed {len(files)} files")
+        console.print(f"[blue]📊[/blue] Processed {file_count} files")
 
         return output_file
 
@@ -481,15 +851,22 @@ class CodeCollector:
             # Clear cache for specific project
             keys_to_remove = [k for k in self.cache_index.keys() if project_name in k]
             for key in keys_to_remove:
-                cache_file = self.cache_dir / self.cache_index[key]["file"]
-                if cache_file.exists():
-                    cache_file.unlink()
+                # The index names the exact cache file, unlink it without checking first
+                try:
+                    os.unlink(os.path.join(self.cache_dir, self.cache_index[key]["file"]))
+                except FileNotFoundError:
+                    pass
                 del self.cache_index[key]
             console.print(f"[green]✓[/green] Cleared cache for project '{project_name}'")
         else:
             # Clear all cache
-            for cache_file in self.cache_dir.glob("cache_*.txt"):
-                cache_file.unlink()
+            try:
+                with os.scandir(self.cache_dir) as entries:
+                    for entry in entries:
+                        if entry.name.startswith("cache_") and entry.name.endswith(".txt"):
+                            os.unlink(entry.path)
+            except FileNotFoundError:
+                pass
             self.cache_index.clear()
             console.print("[green]✓[/green] Cleared all cache")
 
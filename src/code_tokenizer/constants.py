@@ -8,6 +8,11 @@ DEFAULT_EXCLUDE_PATTERNS = [
     "output","package-lock.json"
 ]
 
+# Directories that are never descended into while scanning (hidden directories are skipped too)
+DEFAULT_SKIP_DIRS = [
+    "node_modules", "__pycache__", ".git", "venv", ".venv", "dist", "build"
+]
+
 # Default file patterns
 DEFAULT_FILE_PATTERNS = [
     "*.go", "*.py", "*.js", "*.ts", "*.java", "*.cpp", "*.c",
@@ -22,4 +27,11 @@ CONTEXT_WINDOWS = {
     "GPT-4 (32K)": 32768,
     "GPT-4 Turbo (128K)": 128000,
     "Claude-4 (200K)": 200000
-}
\ No newline at end of file
+}
+
+# Byte size units, each 1024 times larger than the previous one
+BYTE_UNITS = ('B', 'KB', 'MB', 'GB', 'TB')
+
+# Cache validation modes: check (size, mtime) first and hash only changed files,
+# trust (size, mtime) alone, or always compare content hashes
+CACHE_VALIDATION_MODES = ("mtime+hash", "mtime", "hash")
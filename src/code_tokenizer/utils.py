@@ -1,7 +1,10 @@
 """Common utility functions"""
 
+import math
 from typing import Union
 
+from .constants import BYTE_UNITS
+
 
 def format_tokens(token_count: Union[int, float]) -> str:
     """Format token count display, show as k unit for values greater than 1000"""
@@ -15,10 +18,14 @@ def format_tokens(token_count: Union[int, float]) -> str:
             return f"{token_count}"
 
 
-def format_bytes(bytes_value: int) -> str:
+def format_bytes(bytes_value: Union[int, float]) -> str:
     """Format byte count into human-readable format"""
-    for unit in ['B', 'KB', 'MB', 'GB']:
-        if bytes_value < 1024.0:
-            return f"{bytes_value:.2f} {unit}"
-        bytes_value /= 1024.0
-    return f"{bytes_value:.2f} TB"
\ No newline at end of file
+    # Each unit is 2**10 larger, so the unit index follows from the bit length,
+    # negative values always stay in bytes
+    if not math.isfinite(bytes_value):
+        # Infinity and NaN are shown in the largest unit, negative infinity in bytes
+        unit_index = 0 if bytes_value < 0 else len(BYTE_UNITS) - 1
+    else:
+        unit_index = (int(bytes_value).bit_length() - 1) // 10 if bytes_value > 0 else 0
+    unit_index = max(0, min(unit_index, len(BYTE_UNITS) - 1))
+    return f"{bytes_value / (1 << (unit_index * 10)):.2f} {BYTE_UNITS[unit_index]}"
\ No newline at end of file
@@ -3,24 +3,13 @@ Pytest configuration and fixtures for code-tokenizer tests
 """
 
 import pytest
-import tempfile
-from pathlib import Path
+from unittest.mock import MagicMock, patch
 
-
-@pytest.fixture
-def temp_dir():
-    """Create a temporary directory for testing"""
-    temp_path = Path(tempfile.mkdtemp())
-    yield temp_path
-    # Cleanup
-    import shutil
-    shutil.rmtree(temp_path)
+from src.code_tokenizer.code_collector import CodeAnalyzer
+from src.code_tokenizer.constants import CONTEXT_WINDOWS
 
 
-@pytest.fixture
-def sample_python_file(temp_dir):
-    """Create a sample Python file for testing"""
-    python_content = '''
+SAMPLE_PYTHON_CONTENT = '''
 import os
 import sys
 
@@ -53,15 +42,8 @@ if __name__ == "__main__":
     print(f"Fibonacci(10) = {fibonacci(10)}")
 '''
 
-    file_path = temp_dir / "sample.py"
-    file_path.write_text(python_content)
-    return file_path
-
 
-@pytest.fixture
-def sample_javascript_file(temp_dir):
-    """Create a sample JavaScript file for testing"""
-    js_content = '''
+SAMPLE_JAVASCRIPT_CONTENT = '''
 // Utility functions for array manipulation
 const ArrayUtils = {
     // Calculate sum of array elements
@@ -97,11 +79,108 @@ console.log("Doubled even numbers:", doubled);
 console.log("Total sum:", total);
 '''
 
+
+@pytest.fixture
+def temp_dir(tmp_path_factory):
+    """Create a temporary directory for testing"""
+    # Separate from tmp_path, pytest removes old base temp directories in bulk
+    # at the start of later sessions instead of deleting each one in teardown
+    return tmp_path_factory.mktemp("temp")
+
+
+@pytest.fixture
+def sample_python_file(temp_dir):
+    """Create a sample Python file for testing"""
+    file_path = temp_dir / "sample.py"
+    file_path.write_text(SAMPLE_PYTHON_CONTENT)
+    return file_path
+
+
+@pytest.fixture(scope="session")
+def session_python_file(tmp_path_factory):
+    """Create a sample Python file shared by the whole test session"""
+    file_path = tmp_path_factory.mktemp("sample_python") / "sample.py"
+    file_path.write_text(SAMPLE_PYTHON_CONTENT)
+    return file_path
+
+
+@pytest.fixture(scope="session")
+def analyzer():
+    """Shared CodeAnalyzer, so the tiktoken encodings are loaded once per session"""
+    return CodeAnalyzer()
+
+
+@pytest.fixture(scope="session")
+def analyzed_sample_python(analyzer, session_python_file):
+    """Analyze the session sample Python file once, returns (file_path, stats)"""
+    return session_python_file, analyzer.analyze_file(str(session_python_file))
+
+
+@pytest.fixture
+def mock_console(monkeypatch):
+    """Replace the code_collector console with a MagicMock for output assertions"""
+    console = MagicMock()
+    monkeypatch.setattr('src.code_tokenizer.code_collector.console', console)
+    return console
+
+
+@pytest.fixture
+def fake_stats():
+    """Canned analyze_file result for tests that only check the result structure"""
+    token_count = 250
+    return {
+        'file_path': '/test/fake.py',
+        'file_size': 1024,
+        'line_count': 40,
+        'non_empty_line_count': 32,
+        'char_count': 1000,
+        'word_count': 600,
+        'token_count': token_count,
+        'token_count_gpt4': token_count,
+        'avg_tokens_per_line': token_count / 32,
+        'small_lines_count': 2,
+        'small_lines_percentage': 2 / 32 * 100,
+        'context_analysis': {
+            model_name: {
+                'limit': limit,
+                'token_count': token_count,
+                'percentage': token_count / limit * 100,
+                'exceeded': False
+            }
+            for model_name, limit in CONTEXT_WINDOWS.items()
+        }
+    }
+
+
+@pytest.fixture
+def patched_analyzer(analyzer, fake_stats):
+    """Shared analyzer whose analyze_file returns fake_stats without tokenizing"""
+    with patch.object(analyzer, 'analyze_file', return_value=fake_stats):
+        yield analyzer
+
+
+@pytest.fixture
+def sample_javascript_file(temp_dir):
+    """Create a sample JavaScript file for testing"""
     file_path = temp_dir / "sample.js"
-    file_path.write_text(js_content)
+    file_path.write_text(SAMPLE_JAVASCRIPT_CONTENT)
+    return file_path
+
+
+@pytest.fixture(scope="session")
+def session_javascript_file(tmp_path_factory):
+    """Create a sample JavaScript file shared by the whole test session"""
+    file_path = tmp_path_factory.mktemp("sample_javascript") / "sample.js"
+    file_path.write_text(SAMPLE_JAVASCRIPT_CONTENT)
     return file_path
 
 
+@pytest.fixture(scope="session")
+def analyzed_sample_javascript(analyzer, session_javascript_file):
+    """Analyze the session sample JavaScript file once, returns (file_path, stats)"""
+    return session_javascript_file, analyzer.analyze_file(str(session_javascript_file))
+
+
 @pytest.fixture
 def sample_project_structure(temp_dir):
     """Create a sample project structure for testing"""
@@ -516,4 +595,166 @@ def binary_file(temp_dir):
     # Create some binary data
     binary_data = bytes(range(256))  # All possible byte values
     file_path.write_bytes(binary_data)
-    return file_path
\ No newline at end of file
+    return file_path
+
+
+@pytest.fixture(scope="session")
+def large_test_file(tmp_path_factory):
+    """Create a medium-sized Python file shared by the whole test session"""
+    large_content = '''
+# This is a large test file
+import os
+import sys
+import json
+from typing import Dict, List, Optional
+
+def process_data(data: List[Dict]) -> Dict:
+    """Process data"""
+    result = {}
+    for item in data:
+        key = item.get('key')
+        value = item.get('value')
+        if key and value:
+            result[key] = value
+    return result
+
+class DataProcessor:
+    """Data processor"""
+
+    def __init__(self, config: Dict):
+        self.config = config
+        self.processed_items = []
+
+    def process_item(self, item: Dict) -> bool:
+        """Process individual item"""
+        try:
+            processed = process_data([item])
+            self.processed_items.append(processed)
+            return True
+        except Exception as e:
+            print(f"Error processing item: {e}")
+            return False
+
+    def get_statistics(self) -> Dict:
+        """Get statistics"""
+        return {
+            'total_items': len(self.processed_items),
+            'config': self.config
+        }
+
+def main():
+    """Main function"""
+    config = {'debug': True, 'version': '1.0'}
+    processor = DataProcessor(config)
+
+    test_data = [
+        {'key': 'test1', 'value': 100},
+        {'key': 'test2', 'value': 200},
+        {'key': 'test3', 'value': 300}
+    ]
+
+    for item in test_data:
+        processor.process_item(item)
+
+    stats = processor.get_statistics()
+    print(f"Processed {stats['total_items']} items")
+
+if __name__ == "__main__":
+    main()
+'''
+    file_path = tmp_path_factory.mktemp("large_test") / "large_test.py"
+    file_path.write_text(large_content)
+    return file_path
+
+
+@pytest.fixture(scope="session")
+def large_test_stats(analyzer, large_test_file):
+    """Analyze large_test.py once per session"""
+    return analyzer.analyze_file(str(large_test_file))
+
+
+@pytest.fixture(scope="session")
+def special_chars_file(tmp_path_factory):
+    """Create a file with special characters shared by the whole test session"""
+    special_content = '''
+# Test special characters file
+def test_special_chars():
+    """Test various special characters"""
+    special_string = "Hello 世界! @#$%^&*()_+-=[]{}|;':\",./<>?"
+    unicode_chars = "Emoji: 🚀 🎉 ⭐"
+    chinese_text = "这是中文测试内容"
+
+    return {
+        'special': special_string,
+        'unicode': unicode_chars,
+        'chinese': chinese_text
+    }
+
+# Test math symbols
+math_symbols = "∑∏∫∆∇∂∞±×÷≠≤≥≈∝"
+# Test quotes
+quotes = "'single quotes' \"double quotes\" `backticks`"
+'''
+    file_path = tmp_path_factory.mktemp("special_chars") / "special_chars.py"
+    file_path.write_text(special_content)
+    return file_path
+
+
+@pytest.fixture(scope="session")
+def special_chars_stats(analyzer, special_chars_file):
+    """Analyze special_chars.py once per session"""
+    return analyzer.analyze_file(str(special_chars_file))
+
+
+@pytest.fixture(scope="session")
+def large_tokens_file(tmp_path_factory):
+    """Create a file with a large token count shared by the whole test session"""
+    # Each line splits into at least 4 tokens ("print", "('", "line", "')\n"),
+    # so 300 lines stay above the 1000 token threshold the tests assert
+    large_content = "# Large content file\n" + "print('line')\n" * 300
+    file_path = tmp_path_factory.mktemp("large_tokens") / "large_tokens.py"
+    file_path.write_text(large_content)
+    return file_path
+
+
+@pytest.fixture(scope="session")
+def large_tokens_stats(analyzer, large_tokens_file):
+    """Analyze large_tokens.py once per session"""
+    return analyzer.analyze_file(str(large_tokens_file))
+
+
+@pytest.fixture(scope="session")
+def very_long_file(tmp_path_factory):
+    """Create a very long file that overflows some context windows"""
+    very_long_content = "# Very long content file\n"
+    very_long_content += "x" * 100000  # Large number of characters
+
+    file_path = tmp_path_factory.mktemp("very_long") / "very_long.py"
+    file_path.write_text(very_long_content)
+    return file_path
+
+
+@pytest.fixture(scope="session")
+def very_long_stats(analyzer, very_long_file):
+    """Analyze very_long.py once per session, the most expensive tokenization"""
+    return analyzer.analyze_file(str(very_long_file))
+
+
+@pytest.fixture(scope="session")
+def different_file_types_stats(analyzer, tmp_path_factory):
+    """Create small files of different types and analyze each once, keyed by file name"""
+    files_content = {
+        'test.py': 'print("Hello Python")\ndef func():\n    return 42',
+        'test.js': 'console.log("Hello JavaScript");\nfunction func() {\n    return 42;\n}',
+        'test.md': '# Hello Markdown\n\nThis is a test file.\n\n## Section 2',
+        'test.txt': 'Hello Text File\nThis is plain text.',
+        'test.json': '{"hello": "world", "number": 42}'
+    }
+
+    temp_path = tmp_path_factory.mktemp("file_types")
+    results = {}
+    for filename, content in files_content.items():
+        file_path = temp_path / filename
+        file_path.write_text(content)
+        results[filename] = analyzer.analyze_file(str(file_path))
+    return results
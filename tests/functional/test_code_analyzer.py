@@ -4,16 +4,47 @@ Test file analysis integration, formatted output and other features
 """
 
 import pytest
-from unittest.mock import patch
-from src.code_tokenizer.code_collector import CodeAnalyzer
+
+from src.code_tokenizer.utils import format_tokens
+
+# Keep this module on one xdist worker so the session fixtures (analyzer and
+# cached analysis results) are built once and reused by every test here
+pytestmark = pytest.mark.xdist_group("code_analyzer")
+
+
+@pytest.mark.parametrize("n,expected", [
+    (0, "0.00 B"),
+    (100, "100.00 B"),
+    (1023, "1023.00 B"),
+    (1024, "1.00 KB"),
+    (1536, "1.50 KB"),
+    (1 << 20, "1.00 MB"),
+    (1 << 30, "1.00 GB"),
+    (1 << 40, "1.00 TB"),
+    (1 << 50, "1024.00 TB"),
+    (1536.5, "1.50 KB"),
+    # Negative numbers are not scaled to larger units
+    (-100, "-100.00 B"),
+    (-2048, "-2048.00 B"),
+    (float("inf"), "inf TB"),
+    (float("-inf"), "-inf B"),
+    (float("nan"), "nan TB"),
+])
+def test_format_bytes(analyzer, n, expected):
+    """Test byte formatting"""
+    result = analyzer.format_bytes(n)
+
+    assert isinstance(result, str)
+    assert result == expected
 
 
 class TestCodeAnalyzer:
     """CodeAnalyzer test class"""
 
-    def setup_method(self):
-        """Setup before each test method"""
-        self.analyzer = CodeAnalyzer()
+    @pytest.fixture(autouse=True)
+    def _inject_analyzer(self, analyzer):
+        """Use the session-scoped analyzer (it only holds encoders and a width manager)"""
+        self.analyzer = analyzer
 
     def test_init(self):
         """Test CodeAnalyzer initialization"""
@@ -22,9 +53,9 @@ class TestCodeAnalyzer:
         assert self.analyzer.file_analyzer is not None
         assert self.analyzer.width_manager is not None
 
-    def test_analyze_file(self, sample_python_file):
+    def test_analyze_file(self, analyzed_sample_python):
         """Test file analysis functionality"""
-        result = self.analyzer.analyze_file(str(sample_python_file))
+        sample_python_file, result = analyzed_sample_python
 
         # Verify the returned data structure
         assert isinstance(result, dict)
@@ -67,161 +98,49 @@ class TestCodeAnalyzer:
         with pytest.raises(FileNotFoundError):
             self.analyzer.analyze_file("/nonexistent/file.py")
 
-    def test_format_bytes(self):
-        """Test byte formatting"""
-        # Test byte values of different sizes
-        assert self.analyzer.format_bytes(0) == "0.00 B"
-        assert self.analyzer.format_bytes(1023) == "1023.00 B"
-        assert self.analyzer.format_bytes(1024) == "1.00 KB"
-        assert self.analyzer.format_bytes(1536) == "1.50 KB"
-        assert self.analyzer.format_bytes(1048576) == "1.00 MB"
-        assert self.analyzer.format_bytes(1073741824) == "1.00 GB"
-
-        # Verify return type
-        assert isinstance(self.analyzer.format_bytes(100), str)
-
-    def test_format_bytes_negative(self):
-        """Test negative byte formatting"""
-        # Negative numbers should be handled correctly
-        result = self.analyzer.format_bytes(-100)
-        assert isinstance(result, str)
-
-    def test_print_analysis_basic(self, sample_python_file):
+    def test_print_analysis_basic(self, mock_console, analyzed_sample_python):
         """Test basic analysis result printing"""
-        stats = self.analyzer.analyze_file(str(sample_python_file))
+        # Print the statistics actually computed for the sample file
+        sample_python_file, stats = analyzed_sample_python
 
         # Mock console printing
-        with patch('src.code_tokenizer.code_collector.console') as mock_console:
-            self.analyzer.print_analysis(str(sample_python_file), stats)
+        self.analyzer.print_analysis(str(sample_python_file), stats)
 
-            # Verify console.print is called
-            assert mock_console.print.called
-            assert mock_console.print.call_count >= 1
+        # Verify console.print is called
+        assert mock_console.print.called
+        assert mock_console.print.call_count >= 1
 
-    def test_print_analysis_with_context_data(self, sample_python_file):
+    def test_print_analysis_with_context_data(self, mock_console, patched_analyzer):
         """Test analysis result printing with context data"""
-        stats = self.analyzer.analyze_file(str(sample_python_file))
+        stats = patched_analyzer.analyze_file('/test/fake.py')
 
         # Ensure context_analysis has data
         assert 'context_analysis' in stats
         assert len(stats['context_analysis']) > 0
 
-        with patch('src.code_tokenizer.code_collector.console') as mock_console:
-            self.analyzer.print_analysis(str(sample_python_file), stats)
+        patched_analyzer.print_analysis(stats['file_path'], stats)
 
-            # Verify correct printing method is called
-            assert mock_console.print.called
+        # Verify correct printing method is called
+        assert mock_console.print.called
 
-    def test_print_analysis_large_file(self, temp_dir):
+    def test_print_analysis_large_file(self, mock_console, large_test_file, large_test_stats):
         """Test analysis result printing for large files"""
-        # Create a file with more content
-        large_content = '''
-# This is a large test file
-import os
-import sys
-import json
-from typing import Dict, List, Optional
-
-def process_data(data: List[Dict]) -> Dict:
-    """Process data"""
-    result = {}
-    for item in data:
-        key = item.get('key')
-        value = item.get('value')
-        if key and value:
-            result[key] = value
-    return result
-
-class DataProcessor:
-    """Data processor"""
-
-    def __init__(self, config: Dict):
-        self.config = config
-        self.processed_items = []
-
-    def process_item(self, item: Dict) -> bool:
-        """Process individual item"""
-        try:
-            processed = process_data([item])
-            self.processed_items.append(processed)
-            return True
-        except Exception as e:
-            print(f"Error processing item: {e}")
-            return False
-
-    def get_statistics(self) -> Dict:
-        """Get statistics"""
-        return {
-            'total_items': len(self.processed_items),
-            'config': self.config
-        }
-
-def main():
-    """Main function"""
-    config = {'debug': True, 'version': '1.0'}
-    processor = DataProcessor(config)
-
-    test_data = [
-        {'key': 'test1', 'value': 100},
-        {'key': 'test2', 'value': 200},
-        {'key': 'test3', 'value': 300}
-    ]
-
-    for item in test_data:
-        processor.process_item(item)
+        self.analyzer.print_analysis(str(large_test_file), large_test_stats)
 
-    stats = processor.get_statistics()
-    print(f"Processed {stats['total_items']} items")
+        # Verify ability to handle analysis results for large files
+        assert mock_console.print.called
 
-if __name__ == "__main__":
-    main()
-'''
-        large_file = temp_dir / "large_test.py"
-        large_file.write_text(large_content)
-
-        stats = self.analyzer.analyze_file(str(large_file))
-
-        with patch('src.code_tokenizer.code_collector.console') as mock_console:
-            self.analyzer.print_analysis(str(large_file), stats)
+    def test_print_analysis_with_special_characters(self, mock_console,
+                                                    special_chars_file, special_chars_stats):
+        """Test analysis printing for files with special characters"""
+        self.analyzer.print_analysis(str(special_chars_file), special_chars_stats)
 
-            # Verify ability to handle analysis results for large files
-            assert mock_console.print.called
+        # Verify ability to handle special characters
+        assert mock_console.print.called
 
-    def test_print_analysis_with_special_characters(self, temp_dir):
-        """Test analysis printing for files with special characters"""
-        special_content = '''
-# Test special characters file
-def test_special_chars():
-    """Test various special characters"""
-    special_string = "Hello 世界! @#$%^&*()_+-=[]{}|;':\",./<>?"
-    unicode_chars = "Emoji: 🚀 🎉 ⭐"
-    chinese_text = "这是中文测试内容"
-
-    return {
-        'special': special_string,
-        'unicode': unicode_chars,
-        'chinese': chinese_text
-    }
-
-# Test math symbols
-math_symbols = "∑∏∫∆∇∂∞±×÷≠≤≥≈∝"
-# Test quotes
-quotes = "'single quotes' \"double quotes\" `backticks`"
-'''
-        special_file = temp_dir / "special_chars.py"
-        special_file.write_text(special_content)
-
-        stats = self.analyzer.analyze_file(str(special_file))
-
-        with patch('src.code_tokenizer.code_collector.console') as mock_console:
-            self.analyzer.print_analysis(str(special_file), stats)
-
-            # Verify ability to handle special characters
-            assert mock_console.print.called
-
-    def test_print_analysis_error_handling(self, sample_python_file):
+    def test_print_analysis_error_handling(self, analyzed_sample_python):
         """Test error handling in analysis printing"""
-        stats = self.analyzer.analyze_file(str(sample_python_file))
+        sample_python_file, stats = analyzed_sample_python
 
         # Test that it doesn't crash due to data issues
         # Since print_analysis directly uses console, we mainly test the validity of analysis data
@@ -232,7 +151,7 @@ quotes = "'single quotes' \"double quotes\" `backticks`"
         result = self.analyzer.analyze_file(str(sample_python_file))
         assert result == stats
 
-    def test_print_analysis_with_empty_stats(self):
+    def test_print_analysis_with_empty_stats(self, mock_console):
         """Test analysis printing with empty statistics"""
         empty_stats = {
             'file_path': '/test/empty.py',
@@ -249,52 +168,34 @@ quotes = "'single quotes' \"double quotes\" `backticks`"
             'context_analysis': {}
         }
 
-        with patch('src.code_tokenizer.code_collector.console') as mock_console:
-            self.analyzer.print_analysis('/test/empty.py', empty_stats)
+        self.analyzer.print_analysis('/test/empty.py', empty_stats)
 
-            # Should print normally even with empty data
-            assert mock_console.print.called
+        # Should print normally even with empty data
+        assert mock_console.print.called
 
-    def test_print_analysis_with_large_token_count(self, temp_dir):
+    def test_print_analysis_with_large_token_count(self, mock_console,
+                                                   large_tokens_file, large_tokens_stats):
         """Test analysis printing with large token count"""
-        # Create a file with a large amount of content
-        large_content = "# Large content file\n" + "print('line')\n" * 1000
-        large_file = temp_dir / "large_tokens.py"
-        large_file.write_text(large_content)
-
-        stats = self.analyzer.analyze_file(str(large_file))
-
         # Verify token count is large
-        assert stats['token_count'] > 1000
+        assert large_tokens_stats['token_count'] > 1000
 
-        with patch('src.code_tokenizer.code_collector.console') as mock_console:
-            self.analyzer.print_analysis(str(large_file), stats)
+        self.analyzer.print_analysis(str(large_tokens_file), large_tokens_stats)
 
-            # Should be able to handle large token count
-            assert mock_console.print.called
+        # Should be able to handle large token count
+        assert mock_console.print.called
 
-    def test_print_analysis_context_window_exceeded(self, temp_dir):
+    def test_print_analysis_context_window_exceeded(self, mock_console,
+                                                    very_long_file, very_long_stats):
         """Test analysis printing when context window is exceeded"""
-        # Create a very long content file that might cause context window overflow for some models
-        very_long_content = "# Very long content file\n"
-        very_long_content += "x" * 100000  # Large number of characters
-
-        very_long_file = temp_dir / "very_long.py"
-        very_long_file.write_text(very_long_content)
-
-        stats = self.analyzer.analyze_file(str(very_long_file))
+        self.analyzer.print_analysis(str(very_long_file), very_long_stats)
 
-        
-        with patch('src.code_tokenizer.code_collector.console') as mock_console:
-            self.analyzer.print_analysis(str(very_long_file), stats)
+        # Should be able to handle context window overflow
+        assert mock_console.print.called
 
-            # Should be able to handle context window overflow
-            assert mock_console.print.called
-
-    def test_integration_with_file_analyzer(self, sample_python_file):
+    def test_integration_with_file_analyzer(self, analyzed_sample_python):
         """Test integration with FileAnalyzer"""
-        # Call CodeAnalyzer's analyze_file method directly
-        result1 = self.analyzer.analyze_file(str(sample_python_file))
+        # Result of CodeAnalyzer's analyze_file method (cached for the session)
+        sample_python_file, result1 = analyzed_sample_python
 
         # Call FileAnalyzer's analyze_file method directly
         result2 = self.analyzer.file_analyzer.analyze_file(str(sample_python_file))
@@ -302,9 +203,9 @@ quotes = "'single quotes' \"double quotes\" `backticks`"
         # Results should be the same
         assert result1 == result2
 
-    def test_integration_with_context_window_summary(self, sample_python_file):
+    def test_integration_with_context_window_summary(self, analyzed_sample_python):
         """Test integration with context window summary"""
-        stats = self.analyzer.analyze_file(str(sample_python_file))
+        _, stats = analyzed_sample_python
         token_count = stats['token_count']
 
         # Get context window summary directly
@@ -321,11 +222,12 @@ quotes = "'single quotes' \"double quotes\" `backticks`"
             assert 'limit' in item
             assert 'exceeded' in item
 
-    def test_multiple_file_analysis(self, sample_python_file, sample_javascript_file):
+    def test_multiple_file_analysis(self, mock_console,
+                                    analyzed_sample_python, analyzed_sample_javascript):
         """Test multiple file analysis"""
-        # Analyze multiple files
-        py_stats = self.analyzer.analyze_file(str(sample_python_file))
-        js_stats = self.analyzer.analyze_file(str(sample_javascript_file))
+        # Reuse the session analysis results of both files
+        sample_python_file, py_stats = analyzed_sample_python
+        sample_javascript_file, js_stats = analyzed_sample_javascript
 
         # Verify analysis results for both files
         assert py_stats['file_path'] != js_stats['file_path']
@@ -333,17 +235,16 @@ quotes = "'single quotes' \"double quotes\" `backticks`"
         assert js_stats['file_size'] > 0
 
         # Verify they can be printed separately
-        with patch('src.code_tokenizer.code_collector.console') as mock_console:
-            self.analyzer.print_analysis(str(sample_python_file), py_stats)
-            self.analyzer.print_analysis(str(sample_javascript_file), js_stats)
+        self.analyzer.print_analysis(str(sample_python_file), py_stats)
+        self.analyzer.print_analysis(str(sample_javascript_file), js_stats)
 
-            # Should call print method 4 times (2 times per file: Panel + Table)
-            assert mock_console.print.call_count == 4
+        # Should call print method 4 times (2 times per file: Panel + Table)
+        assert mock_console.print.call_count == 4
 
-    def test_analysis_consistency(self, sample_python_file):
+    def test_analysis_consistency(self, analyzed_sample_python):
         """Test analysis result consistency"""
-        # Analyzing the same file multiple times should yield the same result
-        result1 = self.analyzer.analyze_file(str(sample_python_file))
+        # Analyzing the same file again should yield the same result as the cached one
+        sample_python_file, result1 = analyzed_sample_python
         result2 = self.analyzer.analyze_file(str(sample_python_file))
 
         # Except for possible timestamp-related fields, other fields should be the same
@@ -353,25 +254,13 @@ quotes = "'single quotes' \"double quotes\" `backticks`"
             'avg_tokens_per_line', 'small_lines_count', 'small_lines_percentage'
         ]
 
-        for field in consistent_fields:
-            assert result1[field] == result2[field], f"Field {field} should be consistent"
+        # Compare all fields in one assertion, pytest reports a dict diff on mismatch
+        assert ({field: result1[field] for field in consistent_fields} ==
+                {field: result2[field] for field in consistent_fields})
 
-    def test_analysis_with_different_file_types(self, temp_dir):
+    def test_analysis_with_different_file_types(self, different_file_types_stats):
         """Test analysis of different file types"""
-        # Create test files of different types
-        files_content = {
-            'test.py': 'print("Hello Python")\ndef func():\n    return 42',
-            'test.js': 'console.log("Hello JavaScript");\nfunction func() {\n    return 42;\n}',
-            'test.md': '# Hello Markdown\n\nThis is a test file.\n\n## Section 2',
-            'test.txt': 'Hello Text File\nThis is plain text.',
-            'test.json': '{"hello": "world", "number": 42}'
-        }
-
-        results = {}
-        for filename, content in files_content.items():
-            file_path = temp_dir / filename
-            file_path.write_text(content)
-            results[filename] = self.analyzer.analyze_file(str(file_path))
+        results = different_file_types_stats
 
         # Verify all files can be analyzed
         for filename, result in results.items():
@@ -391,9 +280,10 @@ quotes = "'single quotes' \"double quotes\" `backticks`"
         # Markdown files might have different token ratios
         assert md_result['token_count'] > 0
 
-    def test_print_analysis_table_format(self, sample_python_file):
+    def test_print_analysis_table_format(self, mock_console, analyzed_sample_python):
         """Test analysis result table format"""
-        stats = self.analyzer.analyze_file(str(sample_python_file))
+        # Use computed statistics, so the table is checked against real numbers
+        sample_python_file, stats = analyzed_sample_python
 
         # Simplified test: mainly verify analysis results contain required data
         assert 'context_analysis' in stats
@@ -405,4 +295,21 @@ quotes = "'single quotes' \"double quotes\" `backticks`"
             assert 'limit' in info
             assert 'token_count' in info
             assert 'percentage' in info
-            assert 'exceeded' in info
\ No newline at end of file
+            assert 'exceeded' in info
+
+        # Verify the context window table has one row per model
+        self.analyzer.print_analysis(str(sample_python_file), stats)
+
+        table = mock_console.print.call_args_list[-1].args[0]
+        assert len(table.columns) == 4
+        assert table.row_count == len(stats['context_analysis'])
+
+        # Every row shows the computed token count against the model's limit
+        for model, tokens in zip(table.columns[0].cells, table.columns[2].cells):
+            limit = stats['context_analysis'][model]['limit']
+            assert tokens == f"{format_tokens(stats['token_count'])}/{format_tokens(limit)}"
+
+        # The report panel shows the computed statistics
+        panel = mock_console.print.call_args_list[0].args[0]
+        assert f"Total Lines: {stats['line_count']:,}" in panel.renderable
+        assert f"Token Count (GPT-3.5): {format_tokens(stats['token_count'])}" in panel.renderable
@@ -3,35 +3,40 @@ CodeCollector functional tests
 Test file scanning, filtering, cache management and other features
 """
 
-import tempfile
-import shutil
+import os
+import json
+import hashlib
+import re
+import time
+import pytest
 from pathlib import Path
+from typing import Tuple
 from unittest.mock import patch
-from src.code_tokenizer.code_collector import CodeCollector
+from src.code_tokenizer import code_collector
+from src.code_tokenizer.code_collector import CodeCollector, _compile_patterns
 
 
 class TestCodeCollector:
     """CodeCollector test class"""
 
-    def setup_method(self):
-        """Setup before each test method"""
-        self.temp_dir = Path(tempfile.mkdtemp())
-        self.cache_dir = self.temp_dir / ".cache"
+    @pytest.fixture(autouse=True)
+    def _setup_collector(self, tmp_path):
+        """Create a collector with its cache in pytest's tmp_path (cleaned up by pytest)"""
+        self.temp_dir = tmp_path
+        self.cache_dir = tmp_path / ".cache"
         self.collector = CodeCollector(cache_dir=str(self.cache_dir))
 
-    def teardown_method(self):
-        """Cleanup after each test method"""
-        if self.temp_dir.exists():
-            shutil.rmtree(self.temp_dir)
-
     def test_init(self):
         """Test CodeCollector initialization"""
         assert self.collector.cache_dir.exists()
         assert self.collector.cache_index_file.exists() or not self.collector.cache_index_file.exists()
         assert isinstance(self.collector.cache_index, dict)
 
-    def test_init_with_default_cache_dir(self):
+    def test_init_with_default_cache_dir(self, tmp_path, monkeypatch):
         """Test initialization with default cache directory"""
+        # The default cache directory is relative, keep it out of the working tree
+        # and apart from other xdist workers
+        monkeypatch.chdir(tmp_path)
         collector = CodeCollector()
         assert collector.cache_dir.name == ".code_cache"
 
@@ -50,6 +55,24 @@ class TestCodeCollector:
         new_collector = CodeCollector(cache_dir=str(cache_dir))
         assert new_collector.cache_index == test_data
 
+    def test_cache_index_json_fallback(self, temp_dir):
+        """Test the cache index stays plain JSON with and without orjson"""
+        cache_dir = temp_dir / "test_cache"
+        test_data = {"项目_key": {"file": "test.txt", "file_count": 2}}
+
+        collector = CodeCollector(cache_dir=str(cache_dir))
+        collector.cache_index = test_data
+        collector._save_cache_index()
+        assert json.loads(collector.cache_index_file.read_text(encoding='utf-8')) == test_data
+
+        # Without orjson the standard json module reads and writes the same file
+        with patch("src.code_tokenizer.code_collector.orjson", None):
+            fallback_collector = CodeCollector(cache_dir=str(cache_dir))
+            assert fallback_collector.cache_index == test_data
+            fallback_collector._save_cache_index()
+
+        assert CodeCollector(cache_dir=str(cache_dir)).cache_index == test_data
+
     def test_get_file_hash(self, temp_dir):
         """Test file hash calculation"""
         content = "Test content for hash calculation"
@@ -60,9 +83,12 @@ class TestCodeCollector:
         hash2 = self.collector._get_file_hash(file_path)
 
         assert isinstance(hash1, str)
-        assert len(hash1) == 32  # MD5 hash length
+        assert len(hash1) == 64  # 256-bit BLAKE3/BLAKE2b hex digest
         assert hash1 == hash2  # Same file should have same hash
 
+        # Hash can be truncated to a shorter length
+        assert self.collector._get_file_hash(file_path, length=16) == hash1[:16]
+
         # Hash should change after modifying file content
         file_path.write_text("Modified content")
         hash3 = self.collector._get_file_hash(file_path)
@@ -74,6 +100,34 @@ class TestCodeCollector:
         hash_value = self.collector._get_file_hash(nonexistent_file)
         assert hash_value == ""
 
+    def test_get_file_hash_empty_and_mmap(self, temp_dir):
+        """Test hashing empty files and files read through mmap"""
+        empty_file = temp_dir / "empty.txt"
+        empty_file.write_bytes(b"")
+        assert len(self.collector._get_file_hash(empty_file)) == 64
+
+        file_path = temp_dir / "large.bin"
+        file_path.write_bytes(os.urandom(4096))
+        read_hash = self.collector._get_file_hash(file_path)
+
+        # Lower the mmap threshold so the same file is hashed through mmap
+        with patch("src.code_tokenizer.code_collector._MMAP_MIN_SIZE", 1024):
+            assert self.collector._get_file_hash(file_path) == read_hash
+
+    def test_hash_files(self, temp_dir):
+        """Test parallel file hashing keeps the order of files"""
+        files = []
+        for i in range(10):
+            file_path = temp_dir / f"file_{i}.txt"
+            file_path.write_text(f"content {i}")
+            files.append(file_path)
+        files.append(temp_dir / "nonexistent.txt")
+
+        hashes = self.collector._hash_files(files)
+
+        assert hashes == [self.collector._get_file_hash(file_path) for file_path in files]
+        assert hashes[-1] == ""
+
     def test_get_project_hash(self):
         """Test project hash calculation"""
         project_path = Path("/test/project")
@@ -91,6 +145,10 @@ class TestCodeCollector:
         hash3 = self.collector._get_project_hash(project_path, ["*.py"], exclude_patterns)
         assert hash1 != hash3
 
+        # Existing cache keys stay valid, the hash matches the joined-string form
+        hash_source = f"{project_path}_{sorted(file_patterns)}_{sorted(exclude_patterns)}"
+        assert hash1 == hashlib.md5(hash_source.encode()).hexdigest()[:16]
+
     def test_scan_files_basic(self, sample_project_structure):
         """Test basic file scanning functionality"""
         files = self.collector.scan_files(str(sample_project_structure))
@@ -167,6 +225,63 @@ class TestCodeCollector:
         assert "main.py" in file_names
         assert "utils.py" in file_names
 
+    def test_scan_files_include_patterns_in_excluded_directory(self, sample_project_structure):
+        """Test include patterns still reach files inside excluded directories"""
+        files = self.collector.scan_files(
+            str(sample_project_structure),
+            include_patterns=["node_modules/external.js"]
+        )
+
+        file_names = [f.name for f in files]
+        assert "external.js" in file_names
+        assert "main.py" in file_names
+
+    def test_scan_files_reuses_compiled_patterns(self, sample_project_structure):
+        """Test repeated scans with the same patterns reuse the compiled regexes"""
+        file_patterns = ["*.py", "src/*.js"]
+        project_path = str(sample_project_structure)
+        first = self.collector.scan_files(project_path, file_patterns=file_patterns)
+
+        hits = _compile_patterns.cache_info().hits
+        second = self.collector.scan_files(project_path, file_patterns=list(file_patterns))
+
+        assert first == second
+        assert _compile_patterns.cache_info().hits > hits
+
+    @pytest.mark.parametrize("pattern,expected", [
+        ("**/*.txt", ["notes.txt", "src/a/notes.txt"]),
+        ("**/Dockerfile", ["Dockerfile", "src/Dockerfile"]),
+        ("src/**/*.py", ["src/a/b/deep.py", "src/main.py"]),
+        ("src/**/*", ["src/Dockerfile", "src/a/b/deep.py", "src/a/notes.txt", "src/main.py"]),
+        ("src/**", []),
+    ])
+    def test_scan_files_recursive_patterns(self, temp_dir, pattern, expected):
+        """Test '**' matches zero or more directories, like Path.rglob"""
+        for relative_path in ["notes.txt", "Dockerfile", "src/main.py", "src/.dot.py",
+                              "src/Dockerfile", "src/a/notes.txt", "src/a/b/deep.py"]:
+            (temp_dir / relative_path).parent.mkdir(parents=True, exist_ok=True)
+            (temp_dir / relative_path).write_text("x")
+
+        files = self.collector.scan_files(str(temp_dir), file_patterns=[pattern])
+        included = self.collector.scan_files(str(temp_dir), file_patterns=["*.none"],
+                                             include_patterns=[pattern])
+
+        assert [f.relative_to(temp_dir).as_posix() for f in files] == expected
+        # Include patterns also force in hidden files, but '**' alone only matches directories
+        included = [f.relative_to(temp_dir).as_posix() for f in included]
+        assert [path for path in included if path != "src/.dot.py"] == expected
+        assert ("src/.dot.py" in included) == pattern.startswith("src/**/")
+
+    @pytest.mark.skipif(not hasattr(os, "symlink") or os.name == "nt", reason="requires symlinks")
+    def test_scan_files_includes_dangling_symlinks(self, temp_dir):
+        """Test symlinks are matched like files, even when their target is missing"""
+        (temp_dir / "main.py").write_text("x")
+        (temp_dir / "broken.py").symlink_to(temp_dir / "missing.py")
+
+        files = self.collector.scan_files(str(temp_dir))
+
+        assert [f.name for f in files] == ["broken.py", "main.py"]
+
     def test_scan_files_excludes_hidden_files(self, temp_dir):
         """Test excluding hidden files"""
         # Create test files
@@ -190,6 +305,43 @@ class TestCodeCollector:
         for file_path in files:
             assert "node_modules" not in str(file_path)
 
+    def test_scan_files_skip_dirs(self, sample_project_structure):
+        """Test custom skip_dirs replace the default skipped and hidden directories"""
+        (sample_project_structure / ".hidden").mkdir()
+        (sample_project_structure / ".hidden" / "secret.py").write_text("print('hidden')")
+
+        collector = CodeCollector(cache_dir=str(self.cache_dir), skip_dirs=["docs", "tests"])
+        (sample_project_structure / "docs" / "guide.md").write_text("# Guide")
+
+        files = collector.scan_files(str(sample_project_structure), exclude_patterns=[])
+
+        relative_paths = [f.relative_to(sample_project_structure).as_posix() for f in files]
+        assert "src/main.py" in relative_paths
+        # node_modules is not in the custom skip set and not excluded
+        assert "node_modules/external.js" in relative_paths
+        assert "docs/guide.md" not in relative_paths
+        assert "tests/test_main.py" not in relative_paths
+        assert ".hidden/secret.py" in relative_paths
+
+        # By default hidden directories are skipped as well
+        files = self.collector.scan_files(str(sample_project_structure), exclude_patterns=[])
+        relative_paths = [f.relative_to(sample_project_structure).as_posix() for f in files]
+        assert ".hidden/secret.py" not in relative_paths
+
+    def test_scan_files_without_skip_dirs(self, temp_dir):
+        """Test skip_dirs=[] walks every directory, like scans without pruning"""
+        for relative_path in [".circleci/config.yml", ".gitlab/ci.yml", "build/gen.py",
+                              "node_modules/lib.js", "src/main.py", "src/.hidden.py"]:
+            (temp_dir / relative_path).parent.mkdir(parents=True, exist_ok=True)
+            (temp_dir / relative_path).write_text("x")
+
+        collector = CodeCollector(cache_dir=str(self.cache_dir), skip_dirs=[])
+        files = collector.scan_files(str(temp_dir), exclude_patterns=[])
+
+        assert [f.relative_to(temp_dir).as_posix() for f in files] == [
+            ".circleci/config.yml", ".gitlab/ci.yml", "build/gen.py", "node_modules/lib.js",
+            "src/main.py"]
+
     def test_scan_files_empty_directory(self, temp_dir):
         """Test scanning empty directory"""
         files = self.collector.scan_files(str(temp_dir))
@@ -261,6 +413,182 @@ class TestCodeCollector:
         cache_files = list(self.cache_dir.glob("cache_*.txt"))
         assert len(cache_files) > 0
 
+    def test_collect_code_cache_hit_skips_hashing(self, sample_project_structure):
+        """Test that building and reusing the cache never hashes files separately"""
+        # Recently modified files are always hashed
+        past = time.time() - 60
+        for path in sample_project_structure.rglob("*"):
+            os.utime(path, (past, past))
+
+        output_file1 = self.temp_dir / "collected1.txt"
+        output_file2 = self.temp_dir / "collected2.txt"
+
+        project_path = str(sample_project_structure)
+        with patch.object(self.collector, '_get_file_hash',
+                          wraps=self.collector._get_file_hash) as get_file_hash:
+            self.collector.collect_code(project_path, output_file=str(output_file1))
+            self.collector.collect_code(project_path, output_file=str(output_file2))
+
+        assert not get_file_hash.called
+        assert output_file1.read_bytes() == output_file2.read_bytes()
+
+        # Cached hashes match hashing the files directly
+        cache_entry = next(iter(self.collector.cache_index.values()))
+        for relative_path, metadata in cache_entry["files"].items():
+            file_hash = self.collector._get_file_hash(sample_project_structure / relative_path)
+            assert metadata["content_hash"] == file_hash
+
+    def test_collect_code_cache_catches_edits_within_racy_window(self, sample_project_structure):
+        """Test an edit right after collecting is found even if size and mtime stay the same"""
+        output_file = self.temp_dir / "collected.txt"
+        self.collector.collect_code(str(sample_project_structure), output_file=str(output_file))
+
+        # Same size and mtime, like a second write within a coarse timestamp
+        main_file = sample_project_structure / "src" / "main.py"
+        stat = main_file.stat()
+        main_file.write_text(main_file.read_text().replace("Hello", "Howdy"))
+        os.utime(main_file, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+
+        self.collector.collect_code(str(sample_project_structure), output_file=str(output_file))
+        assert "Howdy from main!" in output_file.read_text(encoding='utf-8')
+
+    def test_collect_code_warm_scan_skips_unchanged_directories(self, sample_project_structure):
+        """Test cache hits only list directories that changed since the cached walk"""
+        # Age the project, recently modified directories are not trusted by warm scans
+        past = time.time() - 60
+        for path in [sample_project_structure, *sample_project_structure.rglob("*")]:
+            os.utime(path, (past, past))
+
+        output_file1 = self.temp_dir / "collected1.txt"
+        output_file2 = self.temp_dir / "collected2.txt"
+        output_file3 = self.temp_dir / "collected3.txt"
+        project_path = str(sample_project_structure)
+        self.collector.collect_code(project_path, output_file=str(output_file1))
+
+        with patch("src.code_tokenizer.code_collector.os.scandir", wraps=os.scandir) as scandir:
+            self.collector.collect_code(project_path, output_file=str(output_file2))
+        assert not scandir.called
+        assert output_file1.read_bytes() == output_file2.read_bytes()
+
+        # A new file is found by listing only its directory again
+        (sample_project_structure / "src" / "new_module.py").write_text("print('new')\n")
+        with patch("src.code_tokenizer.code_collector.os.scandir", wraps=os.scandir) as scandir:
+            self.collector.collect_code(project_path, output_file=str(output_file3))
+        assert [Path(call.args[0]).name for call in scandir.call_args_list] == ["src"]
+        assert "new_module.py" in output_file3.read_text(encoding='utf-8')
+
+    def _collect_warm_and_cold(self, project_path: Path) -> Tuple[str, str]:
+        """Collect a project with and without its cache, returns both outputs without timestamps"""
+        outputs = []
+        for name, use_cache in [("warm.txt", True), ("cold.txt", False)]:
+            self.collector.collect_code(str(project_path), output_file=str(self.temp_dir / name),
+                                        use_cache=use_cache)
+            content = (self.temp_dir / name).read_text(encoding='utf-8')
+            outputs.append(re.sub(r"^# Collection Time: .*$", "", content, flags=re.MULTILINE))
+        return outputs[0], outputs[1]
+
+    def test_collect_code_warm_scan_lists_directories_with_changed_permissions(
+            self, sample_project_structure):
+        """Test a permission change, which only updates the change time, lists a directory again"""
+        past = time.time() - 60
+        for path in [sample_project_structure, *sample_project_structure.rglob("*")]:
+            os.utime(path, (past, past))
+        project_path = str(sample_project_structure)
+        self.collector.collect_code(project_path, output_file=str(self.temp_dir / "collected.txt"))
+
+        src_dir = sample_project_structure / "src"
+        src_dir.chmod(0o700)
+        with patch("src.code_tokenizer.code_collector.os.scandir", wraps=os.scandir) as scandir:
+            self.collector.collect_code(project_path, output_file=str(self.temp_dir / "again.txt"))
+        assert [Path(call.args[0]).name for call in scandir.call_args_list] == ["src"]
+
+    def test_collect_code_warm_scan_keeps_unreadable_files(self, sample_project_structure):
+        """Test files that could not be read are still found by the next warm scan"""
+        past = time.time() - 60
+        for path in [sample_project_structure, *sample_project_structure.rglob("*")]:
+            os.utime(path, (past, past))
+
+        read_file = code_collector._read_file
+
+        def failing_read(file_path):
+            if file_path.name == "utils.py":
+                raise PermissionError("Permission denied")
+            return read_file(file_path)
+
+        with patch("src.code_tokenizer.code_collector._read_file", failing_read):
+            self.collector.collect_code(str(sample_project_structure),
+                                        output_file=str(self.temp_dir / "collected.txt"))
+        content = (self.temp_dir / "collected.txt").read_text(encoding='utf-8')
+        assert "Unable to read file" in content
+
+        warm, cold = self._collect_warm_and_cold(sample_project_structure)
+        assert "Helper result" in warm
+        assert warm == cold
+
+    @pytest.mark.skipif(not hasattr(os, "symlink") or os.name == "nt", reason="requires symlinks")
+    def test_collect_code_warm_scan_matches_cold_scan_for_symlinks(self, sample_project_structure):
+        """Test symlinks whose target disappears are collected the same with or without cache"""
+        target = sample_project_structure / "docs" / "target.py"
+        target.write_text("print('target')\n")
+        (sample_project_structure / "src" / "link.py").symlink_to(target)
+        past = time.time() - 60
+        for path in [sample_project_structure, *sample_project_structure.rglob("*")]:
+            os.utime(path, (past, past), follow_symlinks=False)
+        self.collector.collect_code(str(sample_project_structure),
+                                    output_file=str(self.temp_dir / "collected.txt"))
+
+        target.unlink()
+        warm, cold = self._collect_warm_and_cold(sample_project_structure)
+        assert "src/link.py" in warm
+        assert warm == cold
+
+    def test_collect_code_cache_invalidated_by_file_change(self, sample_project_structure):
+        """Test that modified files invalidate the cache"""
+        output_file1 = self.temp_dir / "collected1.txt"
+        output_file2 = self.temp_dir / "collected2.txt"
+
+        self.collector.collect_code(str(sample_project_structure), output_file=str(output_file1))
+
+        # Modify a collected file, the size changes as well
+        (sample_project_structure / "src" / "main.py").write_text("print('modified main')\n")
+
+        self.collector.collect_code(str(sample_project_structure), output_file=str(output_file2))
+
+        assert "modified main" not in output_file1.read_text(encoding='utf-8')
+        assert "modified main" in output_file2.read_text(encoding='utf-8')
+
+    def test_collect_code_cache_validation_modes(self, sample_project_structure):
+        """Test cache validation when only the modification time changes"""
+        self.collector.collect_code(str(sample_project_structure),
+                                    output_file=str(self.temp_dir / "collected.txt"))
+
+        # Same content with a new modification time
+        main_file = sample_project_structure / "src" / "main.py"
+        stat = main_file.stat()
+        os.utime(main_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+        def used_cache(cache_validation):
+            # File blocks are only written when the cache is rebuilt
+            with patch.object(self.collector, '_write_file_blocks',
+                              wraps=self.collector._write_file_blocks) as write_file_blocks:
+                self.collector.collect_code(str(sample_project_structure),
+                                            output_file=str(self.temp_dir / "collected.txt"),
+                                            cache_validation=cache_validation)
+            return not write_file_blocks.called
+
+        # Content hash is unchanged, so the cache stays valid
+        assert used_cache("mtime+hash")
+        assert used_cache("hash")
+
+        # Changed metadata alone invalidates the cache
+        os.utime(main_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 2 * 10**9))
+        assert not used_cache("mtime")
+
+    def test_collect_code_invalid_cache_validation(self, sample_project_structure):
+        """Test invalid cache validation mode"""
+        with pytest.raises(ValueError):
+            self.collector.collect_code(str(sample_project_structure), cache_validation="size")
+
     def test_collect_code_without_cache(self, sample_project_structure):
         """Test code collection without cache"""
         output_file = self.temp_dir / "collected_no_cache.txt"
@@ -278,6 +606,19 @@ class TestCodeCollector:
         cache_files = list(self.cache_dir.glob("cache_*.txt"))
         assert len(cache_files) == 0
 
+    def test_collect_code_matches_scan(self, sample_project_structure):
+        """Test collected files match scan_files in count and order"""
+        output_file = self.temp_dir / "collected_scan.txt"
+        files = self.collector.scan_files(str(sample_project_structure))
+
+        self.collector.collect_code(str(sample_project_structure), output_file=str(output_file),
+                                    use_cache=False)
+
+        content = output_file.read_text(encoding='utf-8')
+        assert f"# File Count: {len(files)}\n" in content
+        written = re.findall(r"^--- \[\d+\] - \[(.+)\] ---$", content, re.MULTILINE)
+        assert written == [str(f.relative_to(sample_project_structure)) for f in files]
+
     def test_collect_code_no_files_found(self, temp_dir):
         """Test code collection when no files found"""
         output_file = self.temp_dir / "empty_result.txt"
@@ -333,12 +674,15 @@ class TestCodeCollector:
         # Create some cache files
         (self.cache_dir / "cache1.txt").write_text("test1")
         (self.cache_dir / "cache2.txt").write_text("test2")
+        (self.cache_dir / "cache_abc123.txt").write_text("test3")
 
         # Clear all cache
         self.collector.clear_cache()
 
         assert len(self.collector.cache_index) == 0
         assert not list(self.cache_dir.glob("cache_*.txt"))
+        # The cache index itself is kept
+        assert self.collector.cache_index_file.exists()
 
     def test_clear_cache_project_specific(self):
         """Test clearing cache for specific project"""
@@ -351,11 +695,13 @@ class TestCodeCollector:
         (self.cache_dir / "cache1.txt").write_text("test1")
         (self.cache_dir / "cache2.txt").write_text("test2")
 
-        # Clear only project1's cache
+        # Clear only project1's cache, a missing cache file is ignored
+        self.collector.cache_index["project1_xyz"] = {"file": "cache_missing.txt"}
         self.collector.clear_cache("project1")
 
         # Verify only project1's cache is cleared
         assert "project1_abc" not in self.collector.cache_index
+        assert "project1_xyz" not in self.collector.cache_index
         assert "project2_def" in self.collector.cache_index
         assert not (self.cache_dir / "cache1.txt").exists()
         assert (self.cache_dir / "cache2.txt").exists()
@@ -370,18 +716,17 @@ class TestCodeCollector:
         # Cache index should remain unchanged
         assert self.collector.cache_index == initial_cache_index
 
-    def test_list_cache_empty(self):
+    def test_list_cache_empty(self, mock_console):
         """Test listing empty cache"""
         # Ensure cache is empty
         self.collector.cache_index.clear()
         self.collector._save_cache_index()
 
         # Listing cache should not crash
-        with patch('src.code_tokenizer.code_collector.console') as mock_console:
-            self.collector.list_cache()
-            mock_console.print.assert_called()
+        self.collector.list_cache()
+        mock_console.print.assert_called()
 
-    def test_list_cache_with_data(self):
+    def test_list_cache_with_data(self, mock_console):
         """Test listing cache with data"""
         # Create test cache data
         from datetime import datetime
@@ -401,9 +746,8 @@ class TestCodeCollector:
         (self.cache_dir / "cache_test.txt").write_text("test content")
 
         # Listing cache should not crash
-        with patch('src.code_tokenizer.code_collector.console') as mock_console:
-            self.collector.list_cache()
-            mock_console.print.assert_called()
+        self.collector.list_cache()
+        mock_console.print.assert_called()
 
     def test_write_files_to_file(self, sample_project_structure):
         """Test internal method for writing files to output file"""
@@ -431,6 +775,26 @@ class TestCodeCollector:
         assert "# Code Collection Report" in content
         assert "####### [idx:" in content
 
+    def test_write_files_to_custom_format_content(self, temp_dir):
+        """Test file bodies are copied verbatim, with newlines normalized and rows counted"""
+        ascii_file = temp_dir / "a.py"
+        ascii_file.write_bytes(b"print('a')\nprint('b')\n")
+        utf8_file = temp_dir / "b.py"
+        utf8_file.write_bytes("# 中文注释\nx = 1".encode('utf-8'))
+        crlf_file = temp_dir / "c.py"
+        crlf_file.write_bytes(b"x = 1\r\ny = 2\r\n")
+        output_file = temp_dir / "output.txt"
+
+        self.collector._write_files_to_custom_format([ascii_file, utf8_file, crlf_file],
+                                                     str(output_file), temp_dir)
+
+        content = output_file.read_bytes()
+        assert (b"####### [idx:1] - [path:a.py] - [rows:2] #######\n"
+                b"print('a')\nprint('b')\n\n\n") in content
+        assert ("####### [idx:2] - [path:b.py] - [rows:1] #######\n"
+                "# 中文注释\nx = 1\n\n\n").encode('utf-8') in content
+        assert b"####### [idx:3] - [path:c.py] - [rows:2] #######\nx = 1\ny = 2\n\n\n" in content
+
     def test_collect_code_with_file_patterns(self, sample_project_structure):
         """Test code collection with file patterns"""
         output_file = self.temp_dir / "python_only.txt"